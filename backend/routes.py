@@ -1,20 +1,25 @@
-from fastapi import APIRouter, File, UploadFile, Request
+from fastapi import APIRouter, File, Form, Query, UploadFile, Request
 from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 import io
 import base64
+import time
+import uuid
+from collections import OrderedDict
 import numpy as np
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 import tensorflow as tf
 from huggingface_hub import hf_hub_download
 
 # Import shared utils
-from utils.config import REPO_ID, MODEL_FILENAME
+from utils.config import REPO_ID, MODEL_FILENAME, DEBUG_MEMORY, ANALYSIS_CACHE_MAX_BYTES, GRADCAM_MAX_DIMENSION
 from utils.logger import logger
 from utils.model_architecture import Avg2MaxPooling, DepthwiseSeparableConv
-from utils.processing import preprocess_image
-from utils.gradcam import make_gradcam_heatmap, save_and_display_gradcam
+from utils.processing import preprocess_image, decode_tensor_batch, preprocess_tensor_batch, MAX_TENSOR_PAYLOAD_BYTES
+from utils.gradcam import make_gradcam_heatmap, make_gradcam_heatmaps, save_and_display_gradcam
 from utils.report_generator import generate_docx_report
+from utils.memory_profiler import start_tracing, take_snapshot
+from utils.traffic_recorder import is_recording, describe_upload, record_request
 
 # Create Router
 router = APIRouter()
@@ -23,6 +28,14 @@ templates = Jinja2Templates(directory="frontend/templates")
 # Global Model Variable
 MODEL = None
 
+# Recent /analyze results, keyed by analysis_id, so /report can reuse them without a re-upload.
+# Least recently used entries are evicted once the stored bytes exceed ANALYSIS_CACHE_MAX_BYTES.
+ANALYSIS_CACHE = OrderedDict()
+ANALYSIS_CACHE_BYTES = 0
+
+# Image formats python-docx can embed directly
+DOCX_IMAGE_FORMATS = {"PNG", "JPEG", "GIF", "BMP", "TIFF"}
+
 def load_model():
     """Loads model from Hugging Face Hub"""
     global MODEL
@@ -40,113 +53,300 @@ def load_model():
             logger.error(f"Error loading model: {e}")
 
 # Helper
-def get_image_base64(image):
+def get_image_bytes(image):
     buffered = io.BytesIO()
     image.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+    return buffered.getvalue()
+
+def get_overlay_jpeg(image, max_dimension=GRADCAM_MAX_DIMENSION):
+    """Compact JPEG of an overlay, capped at max_dimension on the longest side."""
+    image = image.convert("RGB")
+    image.thumbnail((max_dimension, max_dimension))
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=85)
+    return buffered.getvalue()
+
+def get_image_base64(image):
+    return base64.b64encode(get_image_bytes(image)).decode("utf-8")
+
+def cache_analysis(score, contents, gradcam_jpeg):
+    """Caches the compressed upload and Grad-CAM overlay; returns None if the entry alone exceeds the cap."""
+    global ANALYSIS_CACHE_BYTES
+    size = len(contents) + len(gradcam_jpeg or b"")
+    if size > ANALYSIS_CACHE_MAX_BYTES:
+        return None
+
+    analysis_id = uuid.uuid4().hex
+    ANALYSIS_CACHE[analysis_id] = {"score": score, "image": contents, "gradcam_jpeg": gradcam_jpeg, "size": size}
+    ANALYSIS_CACHE_BYTES += size
+    while ANALYSIS_CACHE_BYTES > ANALYSIS_CACHE_MAX_BYTES:
+        _, evicted = ANALYSIS_CACHE.popitem(last=False)
+        ANALYSIS_CACHE_BYTES -= evicted["size"]
+    return analysis_id
+
+def get_cached_analysis(analysis_id):
+    cached = ANALYSIS_CACHE.get(analysis_id)
+    if cached is not None:
+        ANALYSIS_CACHE.move_to_end(analysis_id)
+    return cached
+
+async def read_body_limited(request, limit):
+    """Reads the request body, returning None as soon as it exceeds `limit` bytes."""
+    try:
+        if int(request.headers.get("content-length", 0)) > limit:
+            return None
+    except ValueError:
+        pass
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def summarize_prediction(score):
+    is_malignant = score > 0.5
+    return {
+        "label": "Malignant (Cancerous)" if is_malignant else "Benign (Non-Cancerous)",
+        "score": score,
+        "percent": score * 100 if is_malignant else (1 - score) * 100,
+        "class_id": 1 if is_malignant else 0,
+        "is_malignant": is_malignant,
+    }
 
 # --- Routes ---
 
 @router.on_event("startup")
 async def startup_event():
+    if DEBUG_MEMORY:
+        start_tracing()
     load_model()
 
 @router.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+if DEBUG_MEMORY:
+    @router.get("/debug/memory")
+    def debug_memory(top: int = Query(10, ge=1, le=50)):
+        """Memory snapshot for diagnosing leaks; only mounted when THYROID_DEBUG_MEMORY=1."""
+        return take_snapshot(top_n=top)
+
 @router.post("/analyze")
-async def analyze(file: UploadFile = File(...)):
+async def analyze(file: UploadFile = File(...), include_original: bool = False):
+    """
+    Classifies an uploaded image and returns a compact JPEG Grad-CAM overlay.
+    The uploaded image is only echoed back (as PNG) with ?include_original=true;
+    the web app displays its local copy instead.
+    """
+    arrived = time.time()
     logger.info(f"Analyze request received for file: {file.filename}")
     if MODEL is None:
         # Try loading if not loaded (fallback)
         load_model()
         if MODEL is None:
+            if is_recording():
+                record_request("/analyze", arrived, 503, {"total": time.time() - arrived})
             return JSONResponse(status_code=503, content={"error": "Model not loaded"})
     
-    # Read Image
-    contents = await file.read()
-    image = Image.open(io.BytesIO(contents))
-    
-    # Process
-    processed_img = preprocess_image(image)
-    
-    # Predict
-    preds = MODEL.predict(processed_img)
-    score = float(preds[0][0])
-    is_malignant = score > 0.5
+    start = time.perf_counter()
+    contents, image = b"", None
+    try:
+        # Read Image
+        contents = await file.read()
+        image = Image.open(io.BytesIO(contents))
+        read_done = time.perf_counter()
+
+        # Process
+        processed_img = preprocess_image(image)
+
+        # Predict
+        preds = MODEL.predict(processed_img)
+        score = float(preds[0][0])
+        predict_done = time.perf_counter()
+    except Exception as e:
+        status = 400 if isinstance(e, UnidentifiedImageError) else 500
+        logger.error(f"Analysis error: {e}")
+        if is_recording():
+            record_request("/analyze", arrived, status, {"total": time.perf_counter() - start},
+                           **describe_upload(contents, image, file.content_type))
+        return JSONResponse(status_code=status, content={"error": str(e)})
     
     # Grad-CAM
-    gradcam_b64 = None
+    gradcam_jpeg = None
     try:
         last_conv = next((l.name for l in MODEL.layers[::-1] if "depthwise_separable_conv" in l.name), None)
         if last_conv:
             heatmap = make_gradcam_heatmap(processed_img, MODEL, last_conv)
             if heatmap is not None:
                 gradcam_img = save_and_display_gradcam(image, heatmap)
-                gradcam_b64 = get_image_base64(gradcam_img)
+                gradcam_jpeg = get_overlay_jpeg(gradcam_img)
     except Exception as e:
         logger.warning(f"Grad-CAM generation failed: {e}")
 
-    return {
-        "label": "Malignant (Cancerous)" if is_malignant else "Benign (Non-Cancerous)",
-        "score": score,
-        "percent": score * 100 if is_malignant else (1 - score) * 100,
-        "class_id": 1 if is_malignant else 0,
-        "is_malignant": is_malignant,
-        "original_image": get_image_base64(image),
-        "gradcam_image": gradcam_b64
+    gradcam_done = time.perf_counter()
+
+    response = {
+        **summarize_prediction(score),
+        "analysis_id": cache_analysis(score, contents, gradcam_jpeg),
+        "gradcam_image": base64.b64encode(gradcam_jpeg).decode("utf-8") if gradcam_jpeg else None
     }
+    if include_original:
+        response["original_image"] = get_image_base64(image)
 
-@router.post("/report")
-async def get_report(file: UploadFile = File(...)):
-    logger.info(f"Report request received for file: {file.filename}")
-    try:
+    if is_recording():
+        end = time.perf_counter()
+        record_request("/analyze", arrived, 200, {
+            "read": read_done - start,
+            "predict": predict_done - read_done,
+            "gradcam": gradcam_done - predict_done,
+            "total": end - start
+        }, **describe_upload(contents, image, file.content_type))
+    return response
+
+@router.post("/analyze/tensor")
+async def analyze_tensor(request: Request, gradcam: bool = False):
+    """
+    Batched inference on pre-sized uint8 (N, 224, 224, 3) pixel data, sent either
+    as a `.npy` body or as raw bytes with an `X-Tensor-Shape: N,224,224,3` header.
+    Skips image decoding entirely; Grad-CAM is only computed when requested.
+    """
+    arrived = time.time()
+    if MODEL is None:
+        load_model()
         if MODEL is None:
-            load_model()
-            if MODEL is None:
-                return JSONResponse(status_code=503, content={"error": "Model not loaded"})
+            return JSONResponse(status_code=503, content={"error": "Model not loaded"})
 
-        # Read Image (again)
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # Re-Run Prediction
-        processed_img = preprocess_image(image)
-        preds = MODEL.predict(processed_img)
-        score = float(preds[0][0])
-        is_malignant = score > 0.5
-        label = "Malignant (Cancerous)" if is_malignant else "Benign (Non-Cancerous)"
-        conf_percent = score * 100 if is_malignant else (1 - score) * 100
-        
-        # Re-Run Grad-CAM
-        gradcam_bytes = None
+    start = time.perf_counter()
+    contents = await read_body_limited(request, MAX_TENSOR_PAYLOAD_BYTES)
+    if contents is None:
+        logger.warning("Rejected raw tensor payload: too large")
+        if is_recording():
+            record_request("/analyze/tensor", arrived, 413, {"total": time.perf_counter() - start},
+                           content_type=request.headers.get("content-type"))
+        return JSONResponse(status_code=413, content={"error": f"Payload exceeds {MAX_TENSOR_PAYLOAD_BYTES} bytes"})
+    try:
+        batch = decode_tensor_batch(contents, request.headers.get("x-tensor-shape"))
+    except ValueError as e:
+        logger.warning(f"Rejected raw tensor payload: {e}")
+        if is_recording():
+            record_request("/analyze/tensor", arrived, 400, {"total": time.perf_counter() - start},
+                           **describe_upload(contents, content_type=request.headers.get("content-type")))
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    read_done = time.perf_counter()
+    logger.info(f"Tensor analyze request received for batch of {len(batch)}")
+
+    processed = preprocess_tensor_batch(batch)
+    preds = MODEL.predict(processed, batch_size=len(processed), verbose=0)
+    predict_done = time.perf_counter()
+
+    # One grad model and one tape for the whole batch
+    heatmaps = None
+    if gradcam:
         try:
             last_conv = next((l.name for l in MODEL.layers[::-1] if "depthwise_separable_conv" in l.name), None)
             if last_conv:
-                heatmap = make_gradcam_heatmap(processed_img, MODEL, last_conv)
-                if heatmap is not None:
-                    gradcam_img = save_and_display_gradcam(image, heatmap)
-                    gradcam_bytes = io.BytesIO()
-                    gradcam_img.save(gradcam_bytes, format='PNG')
-                    gradcam_bytes.seek(0)
-        except Exception:
-            pass
-
-        # Prepare Original Image Bytes
-        img_bytes = io.BytesIO()
-        image.save(img_bytes, format='PNG')
-        img_bytes.seek(0)
-        
+                heatmaps = make_gradcam_heatmaps(processed, MODEL, last_conv)
+        except Exception as e:
+            logger.warning(f"Grad-CAM generation failed: {e}")
+
+    results = []
+    for i, pred in enumerate(preds):
+        result = summarize_prediction(float(pred[0]))
+        if gradcam:
+            result["gradcam_image"] = None
+            try:
+                if heatmaps is not None:
+                    gradcam_img = save_and_display_gradcam(batch[i], heatmaps[i])
+                    result["gradcam_image"] = get_image_base64(gradcam_img)
+            except Exception as e:
+                logger.warning(f"Grad-CAM overlay failed: {e}")
+        results.append(result)
+
+    if is_recording():
+        end = time.perf_counter()
+        record_request("/analyze/tensor", arrived, 200, {
+            "read": read_done - start,
+            "predict": predict_done - read_done,
+            "gradcam": end - predict_done,
+            "total": end - start
+        }, batch_size=len(batch), gradcam=gradcam,
+           **describe_upload(contents, content_type=request.headers.get("content-type")))
+    return {"count": len(results), "results": results}
+
+@router.post("/report")
+async def get_report(file: UploadFile = File(None), analysis_id: str = Form(None)):
+    """
+    Builds the DOCX report either from a cached /analyze result (analysis_id),
+    which avoids a second upload, or by re-running the analysis on an uploaded file.
+    """
+    arrived = time.time()
+    start = time.perf_counter()
+    upload = {"source": "analysis_id"} if analysis_id else {"source": "file"}
+    try:
+        if analysis_id:
+            logger.info(f"Report request received for analysis: {analysis_id}")
+            cached = get_cached_analysis(analysis_id)
+            if cached is None:
+                if is_recording():
+                    record_request("/report", arrived, 404, {"total": time.perf_counter() - start}, **upload)
+                return JSONResponse(status_code=404, content={"error": "Analysis not found or expired"})
+            score = cached["score"]
+            img_bytes = io.BytesIO(cached["image"])
+            image = Image.open(img_bytes)
+            if image.format not in DOCX_IMAGE_FORMATS:
+                # e.g. WebP uploads from the browser; only re-encoded when a report is requested
+                img_bytes = io.BytesIO(get_image_bytes(image))
+            gradcam_bytes = io.BytesIO(cached["gradcam_jpeg"]) if cached["gradcam_jpeg"] else None
+        elif file is not None:
+            logger.info(f"Report request received for file: {file.filename}")
+            if MODEL is None:
+                load_model()
+                if MODEL is None:
+                    return JSONResponse(status_code=503, content={"error": "Model not loaded"})
+
+            # Read Image (again)
+            contents = await file.read()
+            image = Image.open(io.BytesIO(contents))
+            if is_recording():
+                upload.update(describe_upload(contents, image, file.content_type))
+
+            # Re-Run Prediction
+            processed_img = preprocess_image(image)
+            preds = MODEL.predict(processed_img)
+            score = float(preds[0][0])
+
+            # Re-Run Grad-CAM
+            gradcam_bytes = None
+            try:
+                last_conv = next((l.name for l in MODEL.layers[::-1] if "depthwise_separable_conv" in l.name), None)
+                if last_conv:
+                    heatmap = make_gradcam_heatmap(processed_img, MODEL, last_conv)
+                    if heatmap is not None:
+                        gradcam_img = save_and_display_gradcam(image, heatmap)
+                        gradcam_bytes = io.BytesIO(get_image_bytes(gradcam_img))
+            except Exception:
+                pass
+
+            # Prepare Original Image Bytes
+            img_bytes = io.BytesIO(get_image_bytes(image))
+        else:
+            return JSONResponse(status_code=400, content={"error": "Provide either a file or an analysis_id"})
+
+        summary = summarize_prediction(score)
+
         # Generate Report
         report_buffer = generate_docx_report(
             image_buffer=img_bytes,
-            prediction_label=label,
+            prediction_label=summary["label"],
             confidence_score=score,
-            confidence_percent=conf_percent,
+            confidence_percent=summary["percent"],
             gradcam_buffer=gradcam_bytes
         )
         report_buffer.seek(0)
+        if is_recording():
+            record_request("/report", arrived, 200, {"total": time.perf_counter() - start}, **upload)
         
         # Return File
         headers = {'Content-Disposition': 'attachment; filename="thyroid_analysis_report.docx"'}
@@ -157,4 +357,6 @@ async def get_report(file: UploadFile = File(...)):
         )
     except Exception as e:
         logger.error(f"Report generation error: {e}")
+        if is_recording():
+            record_request("/report", arrived, 500, {"total": time.perf_counter() - start}, **upload)
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -6,6 +6,15 @@ const predBadge = document.getElementById('predBadge');
 const downloadBtn = document.getElementById('downloadBtn');
 const customAlert = document.getElementById('customAlert');
 
+// --- Upload Settings ---
+// Longest side sent to the server; the model only needs 224px, the rest keeps the overlay sharp
+const UPLOAD_MAX_DIMENSION = Number(dropZone.dataset.maxDimension) || 1024;
+const UPLOAD_QUALITY = 0.9;
+
+// Last analysis, reused by the report button instead of uploading again
+let lastAnalysisId = null;
+let lastUpload = null;
+
 // --- Helper: Show Alert ---
 function showAlert(message, type = 'info') {
     customAlert.textContent = message;
@@ -16,6 +25,44 @@ function showAlert(message, type = 'info') {
     }, 5000);
 }
 
+// --- Helper: Client-side Downscale ---
+function canvasToBlob(canvas, type) {
+    return new Promise(resolve => canvas.toBlob(resolve, type, UPLOAD_QUALITY));
+}
+
+async function downscaleImage(file) {
+    let bitmap;
+    try {
+        bitmap = await createImageBitmap(file);
+    } catch (err) {
+        // Formats the browser cannot decode are sent untouched
+        return file;
+    }
+
+    const scale = Math.min(1, UPLOAD_MAX_DIMENSION / Math.max(bitmap.width, bitmap.height));
+    if (scale === 1 && (file.type === 'image/jpeg' || file.type === 'image/webp')) {
+        bitmap.close();
+        return file;
+    }
+
+    const canvas = document.createElement('canvas');
+    canvas.width = Math.round(bitmap.width * scale);
+    canvas.height = Math.round(bitmap.height * scale);
+    canvas.getContext('2d').drawImage(bitmap, 0, 0, canvas.width, canvas.height);
+    bitmap.close();
+
+    // Browsers without WebP encoding silently fall back to PNG, so retry as JPEG
+    let blob = await canvasToBlob(canvas, 'image/webp');
+    if (!blob || blob.type !== 'image/webp') {
+        blob = await canvasToBlob(canvas, 'image/jpeg');
+    }
+    if (!blob || blob.size >= file.size) return file;
+
+    const ext = blob.type === 'image/webp' ? 'webp' : 'jpg';
+    const name = file.name.replace(/\.[^.]+$/, '') + '.' + ext;
+    return new File([blob], name, { type: blob.type });
+}
+
 // --- Drag & Drop Handlers ---
 ['dragenter', 'dragover', 'dragleave', 'drop'].forEach(eventName => {
     dropZone.addEventListener(eventName, e => {
@@ -55,18 +102,25 @@ async function handleFiles(files) {
     resultsSection.classList.remove('show');
     loader.style.display = 'block';
 
-    const formData = new FormData();
-    formData.append('file', file);
-
     try {
+        const upload = await downscaleImage(file);
+
+        const formData = new FormData();
+        formData.append('file', upload);
+
         const response = await fetch('/analyze', { method: 'POST', body: formData });
         if (!response.ok) throw new Error("Diagnostic analysis failed. Please try again.");
 
         const result = await response.json();
+        lastAnalysisId = result.analysis_id;
+        lastUpload = upload;
 
         // Update Images
-        document.getElementById('originalImg').src = `data:image/png;base64,${result.original_image}`;
-        document.getElementById('gradcamImg').src = `data:image/png;base64,${result.gradcam_image}`;
+        // Show the local upload rather than downloading it again
+        const originalImg = document.getElementById('originalImg');
+        if (originalImg.src.startsWith('blob:')) URL.revokeObjectURL(originalImg.src);
+        originalImg.src = URL.createObjectURL(upload);
+        document.getElementById('gradcamImg').src = `data:image/jpeg;base64,${result.gradcam_image}`;
 
         // Update Metrics
         predBadge.textContent = result.label;
@@ -87,22 +141,28 @@ async function handleFiles(files) {
 }
 
 // --- Report Generation ---
+function requestReport(field, value) {
+    const formData = new FormData();
+    formData.append(field, value);
+    return fetch('/report', { method: 'POST', body: formData });
+}
+
 downloadBtn.addEventListener('click', async () => {
-    const file = fileInput.files[0] || null;
-    if (!file) {
+    if (!lastAnalysisId && !lastUpload) {
         showAlert("No file available for report generation.", "error");
         return;
     }
 
-    const formData = new FormData();
-    formData.append('file', file);
-
     try {
         const originalText = downloadBtn.innerHTML;
         downloadBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Generating Report...';
         downloadBtn.disabled = true;
 
-        const response = await fetch('/report', { method: 'POST', body: formData });
+        // Reuse the server-side analysis; only upload again if it has expired
+        let response = lastAnalysisId ? await requestReport('analysis_id', lastAnalysisId) : null;
+        if ((!response || response.status === 404) && lastUpload) {
+            response = await requestReport('file', lastUpload);
+        }
         if (!response.ok) throw new Error("Report generation failed.");
 
         const blob = await response.blob();
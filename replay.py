@@ -0,0 +1,251 @@
+import argparse
+import io
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay recorded or synthetic traffic against the Thyroid API")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the server under test")
+    parser.add_argument("--log", help="Traffic log written with THYROID_TRAFFIC_LOG (synthetic load if omitted)")
+    parser.add_argument("--payload-dir", help="THYROID_TRAFFIC_PAYLOAD_DIR of the recording, to replay real images")
+    parser.add_argument("--rate", type=float, default=1.0, help="Speed-up over recorded timing (2 = twice as fast, 0 = no pacing)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight")
+    parser.add_argument("--limit", type=int, help="Replay at most this many requests")
+    parser.add_argument("--requests", type=int, default=200, help="Synthetic mode: number of /analyze requests")
+    parser.add_argument("--rps", type=float, default=5.0, help="Synthetic mode: arrival rate in requests per second")
+    parser.add_argument("--size", default="800x600", help="Synthetic mode: image size as WIDTHxHEIGHT")
+    parser.add_argument("--report-ratio", type=float, default=0.2, help="Synthetic mode: fraction of analyses followed by /report")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="Write the summary as JSON to this file")
+    return parser.parse_args()
+
+# --- Workload ---
+
+def encode_synthetic(width, height, mode, fmt):
+    """
+    Encodes a noise image in the recorded format and mode where PIL can write
+    them, falling back to RGB and then to PNG. Returns (bytes, format).
+    """
+    pixels = np.random.default_rng(width * height).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels)
+    Image.init()
+    candidates = []
+    if fmt in Image.SAVE:
+        candidates += [(fmt, mode), (fmt, "RGB")]
+    candidates += [("PNG", mode), ("PNG", "RGB")]
+
+    for candidate_fmt, candidate_mode in candidates:
+        try:
+            buffer = io.BytesIO()
+            image.convert(candidate_mode).save(buffer, format=candidate_fmt)
+            return buffer.getvalue(), candidate_fmt
+        except (OSError, ValueError, KeyError):
+            continue
+    raise ValueError(f"Cannot encode a synthetic {mode} image as {fmt} or PNG")
+
+def load_recorded(path, limit=None):
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    # Pace on arrival time, not completion time, so server latency does not reorder the replay
+    entries.sort(key=lambda e: e["arrival_ts"])
+    if limit:
+        entries = entries[:limit]
+    if not entries:
+        raise SystemExit(f"No requests recorded in {path}")
+    t0 = entries[0]["arrival_ts"]
+    for entry in entries:
+        entry["offset"] = entry["arrival_ts"] - t0
+    return entries
+
+def make_synthetic(args):
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    rng = np.random.default_rng(0)
+    entries = []
+    for i in range(args.requests):
+        offset = i / args.rps
+        entries.append({"route": "/analyze", "offset": offset, "width": width, "height": height,
+                        "mode": "RGB", "format": "JPEG", "content_type": "image/jpeg"})
+        if rng.random() < args.report_ratio:
+            entries.append({"route": "/report", "offset": offset, "source": "analysis_id"})
+    return entries
+
+class PayloadFactory:
+    """Returns the recorded image bytes when available, otherwise a cached synthetic image of the same shape."""
+    def __init__(self, payload_dir=None):
+        self.payload_dir = Path(payload_dir) if payload_dir else None
+        self.synthetic = {}
+        self.lock = threading.Lock()
+
+    def image(self, entry):
+        digest = entry.get("payload_sha256")
+        if self.payload_dir and digest and (self.payload_dir / digest).exists():
+            return (self.payload_dir / digest).read_bytes(), entry.get("content_type") or "application/octet-stream"
+
+        key = (entry.get("width", 224), entry.get("height", 224), entry.get("mode", "RGB"), entry.get("format") or "PNG")
+        with self.lock:
+            if key not in self.synthetic:
+                self.synthetic[key] = encode_synthetic(*key)
+        data, fmt = self.synthetic[key]
+        return data, Image.MIME.get(fmt, f"image/{fmt.lower()}")
+
+    def tensor(self, entry):
+        batch_size = entry.get("batch_size", 1)
+        return np.random.default_rng(batch_size).integers(0, 256, (batch_size, 224, 224, 3), dtype=np.uint8).tobytes()
+
+# --- HTTP ---
+
+def encode_multipart(field, value, filename=None, content_type=None):
+    boundary = uuid.uuid4().hex
+    disposition = f'form-data; name="{field}"' + (f'; filename="{filename}"' if filename else "")
+    head = f"--{boundary}\r\nContent-Disposition: {disposition}\r\n"
+    if content_type:
+        head += f"Content-Type: {content_type}\r\n"
+    body = (head + "\r\n").encode() + (value if isinstance(value, bytes) else value.encode()) + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+class Replayer:
+    def __init__(self, args, payloads):
+        self.args = args
+        self.payloads = payloads
+        self.analysis_ids = []
+        self.results = []
+        self.lock = threading.Lock()
+
+    def build_request(self, entry):
+        route = entry["route"]
+        if route == "/analyze/tensor":
+            query = "?gradcam=true" if entry.get("gradcam") else ""
+            headers = {"Content-Type": "application/octet-stream",
+                       "X-Tensor-Shape": f"{entry.get('batch_size', 1)},224,224,3"}
+            return route + query, self.payloads.tensor(entry), headers
+
+        if route == "/report" and entry.get("source") == "analysis_id":
+            with self.lock:
+                analysis_id = self.analysis_ids[-1] if self.analysis_ids else None
+            if analysis_id:
+                body, content_type = encode_multipart("analysis_id", analysis_id)
+                return route, body, {"Content-Type": content_type}
+
+        image, image_type = self.payloads.image(entry)
+        body, content_type = encode_multipart("file", image, "replay", image_type)
+        return route, body, {"Content-Type": content_type}
+
+    def send(self, entry, scheduled):
+        # Lag is taken when a worker picks the request up, before any payload encoding
+        picked = time.perf_counter()
+        started = picked
+        status, error, body = None, None, b""
+        try:
+            # Payload errors (unreadable recordings, unencodable modes) count as failed requests
+            path, body, headers = self.build_request(entry)
+            started = time.perf_counter()
+            req = urllib.request.Request(self.args.url.rstrip("/") + path, data=body, headers=headers, method="POST")
+            with urllib.request.urlopen(req, timeout=self.args.timeout) as response:
+                status = response.status
+                payload = response.read()
+            if entry["route"] == "/analyze":
+                analysis_id = json.loads(payload).get("analysis_id")
+                if analysis_id:
+                    with self.lock:
+                        self.analysis_ids.append(analysis_id)
+                        del self.analysis_ids[:-100]
+        except urllib.error.HTTPError as e:
+            status, error = e.code, f"HTTP {e.code}"
+        except Exception as e:
+            error = type(e).__name__
+        finished = time.perf_counter()
+
+        with self.lock:
+            self.results.append({
+                "route": entry["route"],
+                "status": status,
+                "error": error,
+                "latency": finished - started,
+                "lag": picked - scheduled,
+                "upload_bytes": len(body),
+                "finished": finished
+            })
+
+    def run(self, entries):
+        start = time.perf_counter()
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            for entry in entries:
+                scheduled = start + (entry["offset"] / self.args.rate if self.args.rate > 0 else 0)
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(self.send, entry, scheduled))
+        # send() records its own failures; anything raised here is a bug and should not pass silently
+        for future in futures:
+            future.result()
+        return start
+
+# --- Reporting ---
+
+def summarize(results, start):
+    if not results:
+        return None
+
+    def stats(rows):
+        latencies = np.array([r["latency"] for r in rows]) * 1000
+        lags = np.array([r["lag"] for r in rows]) * 1000
+        errors = sum(1 for r in rows if r["error"])
+        elapsed = max(r["finished"] for r in rows) - start
+        return {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": errors / len(rows),
+            "throughput_rps": len(rows) / elapsed if elapsed > 0 else 0.0,
+            "upload_mb": sum(r["upload_bytes"] for r in rows) / (1024 * 1024),
+            "latency_ms": {
+                "mean": float(latencies.mean()),
+                **{f"p{q}": float(np.percentile(latencies, q)) for q in (50, 90, 95, 99)},
+                "max": float(latencies.max())
+            },
+            # Time requests waited for a free worker; rising lag means the client or server is saturated
+            "schedule_lag_p95_ms": float(np.percentile(lags, 95)),
+            "status_codes": {str(code): count for code, count in Counter(r["status"] for r in rows).items()}
+        }
+
+    by_route = defaultdict(list)
+    for r in results:
+        by_route[r["route"]].append(r)
+    return {"overall": stats(results), "routes": {route: stats(rows) for route, rows in sorted(by_route.items())}}
+
+def print_summary(summary):
+    print(f"{'route':<18}{'reqs':>7}{'err%':>7}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'lag95':>9}")
+    for name, s in [("ALL", summary["overall"]), *summary["routes"].items()]:
+        lat = s["latency_ms"]
+        print(f"{name:<18}{s['requests']:>7}{s['error_rate'] * 100:>6.1f}%{s['throughput_rps']:>8.2f}"
+              f"{lat['p50']:>9.0f}{lat['p95']:>9.0f}{lat['p99']:>9.0f}{lat['max']:>9.0f}{s['schedule_lag_p95_ms']:>9.0f}")
+    print("(latencies in ms)")
+
+def main():
+    args = parse_args()
+    entries = load_recorded(args.log, args.limit) if args.log else make_synthetic(args)
+    print(f"Replaying {len(entries)} requests against {args.url} "
+          f"(rate x{args.rate}, concurrency {args.concurrency})")
+
+    replayer = Replayer(args, PayloadFactory(args.payload_dir))
+    start = replayer.run(entries)
+    summary = summarize(replayer.results, start)
+    if summary is None:
+        raise SystemExit("No requests were replayed")
+    print_summary(summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
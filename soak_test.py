@@ -0,0 +1,118 @@
+import os
+import warnings
+
+# Suppress warnings and logs
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+warnings.filterwarnings('ignore')
+
+import argparse
+import io
+import json
+import logging
+import sys
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+from fastapi.testclient import TestClient
+
+import backend.routes as routes
+from app import app
+from utils.logger import logger
+from utils.model_architecture import create_fibonacci_net
+from utils.memory_profiler import start_tracing, take_snapshot, top_allocations
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Memory soak test for the FastAPI serving path")
+    parser.add_argument("--requests", type=int, default=5000, help="Total requests after warm-up")
+    parser.add_argument("--warmup", type=int, default=50, help="Requests sent before the baseline snapshot")
+    parser.add_argument("--interval", type=int, default=250, help="Requests between snapshots")
+    parser.add_argument("--image-size", type=int, default=512, help="Side length of the synthetic upload")
+    parser.add_argument("--report-every", type=int, default=10, help="Send a /report request every N requests (0 disables)")
+    parser.add_argument("--tensor-every", type=int, default=0, help="Send an /analyze/tensor request every N requests (0 disables)")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=150.0)
+    parser.add_argument("--max-model-growth", type=int, default=5, help="Allowed growth in live Keras models")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip tracemalloc (much faster, RSS only)")
+    parser.add_argument("--output", help="Write every snapshot to this JSONL file")
+    return parser.parse_args()
+
+def make_upload(size):
+    """Encodes a noise image as PNG so every request exercises decode and resize."""
+    pixels = np.random.default_rng(0).integers(0, 256, (size, size, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def send_request(client, i, args, upload, tensor):
+    if args.tensor_every and i % args.tensor_every == 0:
+        response = client.post("/analyze/tensor?gradcam=true", content=tensor, headers={"X-Tensor-Shape": "1,224,224,3"})
+    elif args.report_every and i % args.report_every == 0:
+        response = client.post("/report", files={"file": ("soak.png", upload, "image/png")})
+    else:
+        response = client.post("/analyze", files={"file": ("soak.png", upload, "image/png")})
+    if response.status_code != 200:
+        raise RuntimeError(f"Request {i} failed with {response.status_code}: {response.text[:200]}")
+
+def main():
+    args = parse_args()
+    # Per-request INFO logs would dominate runtime; keep warnings and errors only
+    logger.setLevel(logging.WARNING)
+
+    routes.MODEL = create_fibonacci_net()
+    upload = make_upload(args.image_size)
+    tensor = np.random.default_rng(1).integers(0, 256, (1, 224, 224, 3), dtype=np.uint8).tobytes()
+    if not args.no_tracemalloc:
+        start_tracing()
+
+    out = open(args.output, "w") if args.output else None
+    with TestClient(app) as client:
+        for i in range(args.warmup):
+            send_request(client, i, args, upload, tensor)
+
+        baseline = take_snapshot()
+        baseline_trace = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        print(f"Baseline after {args.warmup} warm-up requests: RSS {baseline['rss_mb']:.1f} MB, {baseline['tf_objects']}")
+
+        start = time.perf_counter()
+        snapshot = baseline
+        for i in range(1, args.requests + 1):
+            send_request(client, i, args, upload, tensor)
+            if i % args.interval == 0 or i == args.requests:
+                snapshot = take_snapshot()
+                snapshot["requests"] = i
+                rate = i / (time.perf_counter() - start)
+                print(
+                    f"[{i:>6}] RSS {snapshot['rss_mb']:.1f} MB "
+                    f"(+{snapshot['rss_mb'] - baseline['rss_mb']:.1f}), "
+                    f"models {snapshot['tf_objects']['keras_models']}, "
+                    f"graphs {snapshot['tf_objects']['tf_graphs']}, "
+                    + (f"traced {snapshot['tracemalloc']['current_mb']:.1f} MB, " if snapshot["tracemalloc"] else "")
+                    + f"{rate:.1f} req/s"
+                )
+                if out:
+                    out.write(json.dumps(snapshot) + "\n")
+                    out.flush()
+    if out:
+        out.close()
+
+    if baseline_trace is not None:
+        print("\nTop allocation growth since baseline:")
+        for stat in top_allocations(tracemalloc.take_snapshot(), 10, baseline=baseline_trace):
+            print(f"  {stat['size_diff_kb']:+10.1f} KB  {stat['count_diff']:+7d}  {stat['location']}")
+
+    rss_growth = snapshot["rss_mb"] - baseline["rss_mb"]
+    model_growth = snapshot["tf_objects"]["keras_models"] - baseline["tf_objects"]["keras_models"]
+    failures = []
+    if rss_growth > args.max_rss_growth_mb:
+        failures.append(f"RSS grew {rss_growth:.1f} MB (limit {args.max_rss_growth_mb} MB)")
+    if model_growth > args.max_model_growth:
+        failures.append(f"Live Keras models grew by {model_growth} (limit {args.max_model_growth})")
+
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print(f"\nPASS: RSS +{rss_growth:.1f} MB, Keras models {model_growth:+d} over {args.requests} requests")
+
+if __name__ == "__main__":
+    main()
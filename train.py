@@ -0,0 +1,69 @@
+import os
+import warnings
+
+# Suppress warnings and logs
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+warnings.filterwarnings('ignore')
+
+import argparse
+import json
+import tensorflow as tf
+from utils.logger import logger
+from utils.config import MODEL_FILENAME
+from utils.model_architecture import Avg2MaxPooling, DepthwiseSeparableConv
+from utils.training import build_dataset, class_weights, set_precision, train_model, evaluate_model, export_model
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train and evaluate FibonacciNet for thyroid cancer detection")
+    parser.add_argument("--train-dir", help="Training images, one sub-folder per class (benign first)")
+    parser.add_argument("--val-dir", help="Optional validation images with the same layout")
+    parser.add_argument("--eval-dir", help="Held-out images to evaluate after training")
+    parser.add_argument("--model", help="Evaluate an existing .keras model instead of training")
+    parser.add_argument("--output", default=f"models/{MODEL_FILENAME}", help="Where to save the trained model")
+    parser.add_argument("--cache-dir", help="Directory for on-disk caching of decoded images")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--learning-rate", type=float, default=1e-4)
+    parser.add_argument("--balance", choices=["oversample", "class-weight", "none"], default="oversample",
+                        help="Class balancing; 'oversample' upsamples the minority class as in the notebook")
+    parser.add_argument("--mixed-precision", choices=["off", "bfloat16", "float16"], default="off")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if not args.train_dir and not args.model:
+        raise SystemExit("Either --train-dir or --model is required")
+    if args.model and not args.eval_dir:
+        raise SystemExit("--model requires --eval-dir")
+    tf.keras.utils.set_random_seed(args.seed)
+
+    if args.model:
+        custom_objects = {
+            "Avg2MaxPooling": Avg2MaxPooling,
+            "DepthwiseSeparableConv": DepthwiseSeparableConv
+        }
+        model = tf.keras.models.load_model(args.model, custom_objects=custom_objects, compile=False)
+        logger.info(f"Loaded model from {args.model}")
+    else:
+        set_precision(args.mixed_precision)
+        train_ds, num_train = build_dataset(
+            args.train_dir, args.batch_size, training=True, cache_dir=args.cache_dir, seed=args.seed,
+            oversample=args.balance == "oversample"
+        )
+        class_weight = class_weights(args.train_dir) if args.balance == "class-weight" else None
+        val_ds = None
+        if args.val_dir:
+            val_ds, _ = build_dataset(args.val_dir, args.batch_size, cache_dir=args.cache_dir)
+        model = train_model(
+            train_ds, num_train, val_ds, epochs=args.epochs, learning_rate=args.learning_rate, class_weight=class_weight
+        )
+        export_model(model, args.output)
+
+    if args.eval_dir:
+        eval_ds, _ = build_dataset(args.eval_dir, args.batch_size, cache_dir=args.cache_dir)
+        results = evaluate_model(model, eval_ds)
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,23 @@
+import os
+
 # HuggingFace Model Configuration
 REPO_ID = "Diveshj/thyroid_models"
-MODEL_FILENAME = "thyroid_cancer_model.keras"
\ No newline at end of file
+MODEL_FILENAME = "thyroid_cancer_model.keras"
+
+# Raw Tensor Ingestion
+MODEL_INPUT_SHAPE = (224, 224, 3)
+MAX_TENSOR_BATCH = 64
+
+# Longest side of the Grad-CAM overlay returned by /analyze
+GRADCAM_MAX_DIMENSION = 1024
+
+# Total size of recent /analyze results kept for /report, per worker
+ANALYSIS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Diagnostics (opt-in via environment)
+DEBUG_MEMORY = os.getenv("THYROID_DEBUG_MEMORY", "0") == "1"
+
+# Traffic recording for load-test replay (opt-in via environment)
+TRAFFIC_LOG = os.getenv("THYROID_TRAFFIC_LOG")
+TRAFFIC_HASH_PAYLOADS = os.getenv("THYROID_TRAFFIC_HASH_PAYLOADS", "0") == "1"
+TRAFFIC_PAYLOAD_DIR = os.getenv("THYROID_TRAFFIC_PAYLOAD_DIR")
@@ -45,6 +45,42 @@ def make_gradcam_heatmap(img_array, model, last_conv_layer_name, pred_index=None
     heatmap = tf.maximum(heatmap, 0) / tf.math.reduce_max(heatmap)
     return heatmap.numpy()
 
+def make_gradcam_heatmaps(img_batch, model, last_conv_layer_name):
+    """
+    Generates Grad-CAM heatmaps for a whole batch with a single grad model
+    and a single GradientTape. Returns one normalized heatmap per image.
+    """
+    try:
+        grad_model = tf.keras.models.Model(
+            [model.inputs], [model.get_layer(last_conv_layer_name).output, model.output]
+        )
+    except Exception as e:
+        logger.error(f"Error creating Grad-CAM model: {e}")
+        return None
+
+    with tf.GradientTape() as tape:
+        last_conv_layer_output, preds = grad_model(img_batch)
+
+        if isinstance(preds, list):
+            preds = preds[0]
+
+        # Top predicted class per sample
+        class_channel = tf.gather(preds, tf.argmax(preds, axis=1), axis=1, batch_dims=1)
+
+    # Samples are independent, so the gradient of the batch sum gives per-sample gradients
+    grads = tape.gradient(class_channel, last_conv_layer_output)
+
+    # Per-sample channel weights: (N, C)
+    pooled_grads = tf.reduce_mean(grads, axis=(1, 2))
+
+    # Weighted sum of feature maps per sample: (N, H, W)
+    heatmaps = tf.einsum("nhwc,nc->nhw", last_conv_layer_output, pooled_grads)
+
+    # Normalize each heatmap between 0 & 1
+    heatmaps = tf.maximum(heatmaps, 0)
+    heatmaps = tf.math.divide_no_nan(heatmaps, tf.reduce_max(heatmaps, axis=(1, 2), keepdims=True))
+    return list(heatmaps.numpy())
+
 def save_and_display_gradcam(img, heatmap, alpha=0.4):
     """
     Superimposes the heatmap on the original image.
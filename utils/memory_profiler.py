@@ -0,0 +1,85 @@
+import gc
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import tensorflow as tf
+from utils.logger import logger
+
+def get_rss_mb():
+    """
+    Returns the current resident set size in MB.
+    Falls back to peak RSS where /proc is unavailable (e.g. macOS).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB on Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def count_tf_objects():
+    """
+    Counts live TF/Keras objects that should stay flat in a healthy worker.
+    A steady rise in models or graphs points at per-request model building.
+    """
+    counts = {"keras_models": 0, "keras_layers": 0, "tf_graphs": 0, "tf_variables": 0}
+    for obj in gc.get_objects():
+        try:
+            if isinstance(obj, tf.keras.Model):
+                counts["keras_models"] += 1
+            elif isinstance(obj, tf.keras.layers.Layer):
+                counts["keras_layers"] += 1
+            elif isinstance(obj, tf.Graph):
+                counts["tf_graphs"] += 1
+            elif isinstance(obj, tf.Variable):
+                counts["tf_variables"] += 1
+        except Exception:
+            # Some proxies raise on isinstance checks; they are not what we are counting
+            continue
+    return counts
+
+def start_tracing(nframes=1):
+    """Starts tracemalloc if it is not already running."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(nframes)
+        logger.info(f"tracemalloc started with {nframes} frame(s)")
+
+def top_allocations(snapshot, top_n=10, baseline=None):
+    """
+    Summarises the largest allocation sites in a tracemalloc snapshot,
+    or the largest growth since a baseline snapshot when one is given.
+    """
+    if baseline is not None:
+        stats = snapshot.compare_to(baseline, "lineno")
+        return [
+            {"location": str(s.traceback), "size_kb": s.size / 1024, "size_diff_kb": s.size_diff / 1024, "count_diff": s.count_diff}
+            for s in stats[:top_n]
+        ]
+    stats = snapshot.statistics("lineno")
+    return [{"location": str(s.traceback), "size_kb": s.size / 1024, "count": s.count} for s in stats[:top_n]]
+
+def take_snapshot(top_n=10):
+    """
+    Collects a point-in-time memory snapshot: RSS, tracemalloc totals and
+    top allocators (when tracing), TF/Keras object counts and gc counters.
+    """
+    gc.collect()
+    snapshot = {
+        "timestamp": time.time(),
+        "rss_mb": get_rss_mb(),
+        "tf_objects": count_tf_objects(),
+        "gc_objects": len(gc.get_objects()),
+        "tracemalloc": None
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot["tracemalloc"] = {
+            "current_mb": current / (1024 * 1024),
+            "peak_mb": peak / (1024 * 1024),
+            "top": top_allocations(tracemalloc.take_snapshot(), top_n)
+        }
+    return snapshot
@@ -125,6 +125,7 @@ def create_fibonacci_net(input_shape=(224, 224, 3), num_classes=1):
 
     # --- Output ---
     x = layers.GlobalAveragePooling2D()(x)
-    outputs = layers.Dense(num_classes, activation='sigmoid')(x)
+    # Keep the output in float32 so mixed-precision training stays numerically stable
+    outputs = layers.Dense(num_classes, activation='sigmoid', dtype='float32')(x)
 
     return Model(inputs, outputs)
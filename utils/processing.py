@@ -1,6 +1,8 @@
+import io
 import numpy as np
 from PIL import Image
 import tensorflow as tf
+from utils.config import MODEL_INPUT_SHAPE, MAX_TENSOR_BATCH
 from utils.logger import logger
 
 def preprocess_image(image):
@@ -28,3 +30,57 @@ def preprocess_image(image):
     img_array = img_array.astype("float32") / 255.0
     
     return img_array
+
+NPY_MAGIC = b"\x93NUMPY"
+# Largest valid payload: a full batch plus room for a `.npy` header
+MAX_TENSOR_PAYLOAD_BYTES = MAX_TENSOR_BATCH * int(np.prod(MODEL_INPUT_SHAPE)) + 4096
+
+def decode_tensor_batch(contents, shape_header=None):
+    """
+    Reads a raw uint8 batch of shape (N, 224, 224, 3) without copying.
+    The payload is either a `.npy` file or raw bytes whose shape is given
+    by a header such as "4,224,224,3". Raises ValueError on malformed input.
+    """
+    offset = 0
+    if contents[:len(NPY_MAGIC)] == NPY_MAGIC:
+        stream = io.BytesIO(contents)
+        try:
+            version = np.lib.format.read_magic(stream)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+        except Exception as e:
+            # numpy raises ValueError, SyntaxError or tokenize errors for corrupt headers
+            raise ValueError(f"Invalid .npy header: {e}")
+        if fortran_order:
+            raise ValueError("Fortran-ordered arrays are not supported")
+        if dtype != np.uint8:
+            raise ValueError(f"Expected dtype uint8, got {dtype}")
+        offset = stream.tell()
+    elif shape_header:
+        try:
+            shape = tuple(int(dim) for dim in shape_header.split(","))
+        except ValueError:
+            raise ValueError(f"Invalid shape header: {shape_header!r}")
+    else:
+        raise ValueError("Raw tensor payloads require an X-Tensor-Shape header")
+
+    if len(shape) != 4 or tuple(shape[1:]) != MODEL_INPUT_SHAPE:
+        raise ValueError(f"Expected shape (N, {', '.join(map(str, MODEL_INPUT_SHAPE))}), got {shape}")
+    if not 1 <= shape[0] <= MAX_TENSOR_BATCH:
+        raise ValueError(f"Batch size must be between 1 and {MAX_TENSOR_BATCH}, got {shape[0]}")
+
+    expected = int(np.prod(shape))
+    if len(contents) - offset != expected:
+        raise ValueError(f"Expected {expected} bytes of pixel data, got {len(contents) - offset}")
+
+    logger.info(f"Decoded raw tensor batch of shape: {shape}")
+    return np.frombuffer(contents, dtype=np.uint8, offset=offset).reshape(shape)
+
+def preprocess_tensor_batch(batch):
+    """
+    Rescales a uint8 (N, 224, 224, 3) batch to float32 in [0, 1],
+    matching preprocess_image without the decode and resize steps.
+    """
+    return np.multiply(batch, 1.0 / 255.0, dtype=np.float32)
@@ -0,0 +1,53 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+from utils.config import TRAFFIC_LOG, TRAFFIC_HASH_PAYLOADS, TRAFFIC_PAYLOAD_DIR
+from utils.logger import logger
+
+_lock = threading.Lock()
+
+if TRAFFIC_LOG:
+    Path(TRAFFIC_LOG).parent.mkdir(parents=True, exist_ok=True)
+
+def is_recording():
+    return bool(TRAFFIC_LOG)
+
+def describe_upload(contents, image=None, content_type=None):
+    """
+    Summarises an upload for the traffic log. Payloads are referenced by
+    SHA-256 when hashing is enabled, and written once per hash to
+    TRAFFIC_PAYLOAD_DIR when set, so replays can reuse the real images.
+    """
+    entry = {"upload_bytes": len(contents), "content_type": content_type}
+    if image is not None:
+        entry.update({"width": image.size[0], "height": image.size[1], "mode": image.mode, "format": image.format})
+
+    if TRAFFIC_HASH_PAYLOADS or TRAFFIC_PAYLOAD_DIR:
+        digest = hashlib.sha256(contents).hexdigest()
+        entry["payload_sha256"] = digest
+        if TRAFFIC_PAYLOAD_DIR:
+            path = Path(TRAFFIC_PAYLOAD_DIR) / digest
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(contents)
+    return entry
+
+def record_request(route, arrived, status, timings, **fields):
+    """
+    Appends one request's metadata as a JSON line to TRAFFIC_LOG.
+    `arrived` is the wall-clock time the handler started, so replays keep the
+    original arrival order and spacing regardless of server latency. FastAPI
+    parses multipart bodies before the handler runs, so for upload routes this
+    is when the upload finished arriving, not when the request began.
+    """
+    if not TRAFFIC_LOG:
+        return
+    entry = {"arrival_ts": arrived, "route": route, "status": status, **fields,
+             "timings_ms": {k: round(v * 1000, 2) for k, v in timings.items()}}
+    try:
+        with _lock:
+            with open(TRAFFIC_LOG, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        logger.warning(f"Traffic recording failed: {e}")
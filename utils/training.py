@@ -0,0 +1,210 @@
+import hashlib
+import time
+from pathlib import Path
+import numpy as np
+import tensorflow as tf
+from utils.config import MODEL_INPUT_SHAPE
+from utils.logger import logger
+from utils.model_architecture import create_fibonacci_net
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".gif"}
+AUTOTUNE = tf.data.AUTOTUNE
+
+def list_labelled_images(data_dir):
+    """
+    Collects image paths and binary labels from a directory laid out as
+    data_dir/<class_name>/<image>. Class folders are sorted by name, so the
+    first folder is label 0 (benign) and the second is label 1 (malignant).
+    """
+    data_dir = Path(data_dir)
+    class_dirs = sorted(p for p in data_dir.iterdir() if p.is_dir())
+    if len(class_dirs) != 2:
+        raise ValueError(f"Expected 2 class folders in {data_dir}, found {len(class_dirs)}")
+
+    paths, labels = [], []
+    for label, class_dir in enumerate(class_dirs):
+        files = sorted(str(p) for p in class_dir.rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+        logger.info(f"Class {label} ({class_dir.name}): {len(files)} images")
+        paths.extend(files)
+        labels.extend([label] * len(files))
+
+    if not paths:
+        raise ValueError(f"No images found in {data_dir}")
+    return paths, labels
+
+def oversample_minority(paths, labels, seed=42):
+    """
+    Upsamples the minority class with replacement to the size of the majority
+    class, as the notebook does before training. The draw is seeded, so the
+    resampled file list (and its on-disk cache) is reproducible.
+    """
+    rng = np.random.default_rng(seed)
+    paths, labels = np.array(paths), np.array(labels)
+    counts = np.bincount(labels, minlength=2)
+    minority = int(np.argmin(counts))
+    extra = rng.choice(np.flatnonzero(labels == minority), size=counts.max() - counts.min(), replace=True)
+    logger.info(f"Oversampling class {minority} from {counts.min()} to {counts.max()} images")
+    return list(paths) + list(paths[extra]), list(labels) + list(labels[extra])
+
+def class_weights(data_dir):
+    """Inverse-frequency class weights for Model.fit, as an alternative to oversampling."""
+    _, labels = list_labelled_images(data_dir)
+    counts = np.bincount(labels, minlength=2)
+    return {c: len(labels) / (2 * counts[c]) for c in range(2)}
+
+def cache_key(data_dir, paths):
+    """
+    Identifies a cached dataset by the resolved directory plus every file's
+    path, size and mtime, so a different or modified directory never reuses
+    stale tensors.
+    """
+    digest = hashlib.sha256(str(Path(data_dir).resolve()).encode())
+    for path in paths:
+        stat = Path(path).stat()
+        digest.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+def decode_image(path, label):
+    """
+    Decodes and resizes a single image to uint8 (224, 224, 3).
+    Uses bicubic resizing to match PIL's default in preprocess_image.
+    """
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, MODEL_INPUT_SHAPE[:2], method="bicubic", antialias=True)
+    image = tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8)
+    return image, label
+
+def normalize_image(image, label):
+    """Rescales pixel values to [0, 1], as in preprocess_image."""
+    return tf.cast(image, tf.float32) / 255.0, tf.cast(label, tf.float32)
+
+def build_dataset(data_dir, batch_size=16, training=False, cache_dir=None, shuffle_buffer=1024, seed=42, oversample=False):
+    """
+    Builds a tf.data input pipeline over a class-folder image directory.
+    Images are decoded in parallel and cached as uint8 tensors (on disk when
+    cache_dir is given, otherwise in memory) so later epochs skip decoding.
+    With oversample=True the minority class is upsampled first (see oversample_minority).
+    """
+    paths, labels = list_labelled_images(data_dir)
+    if oversample:
+        paths, labels = oversample_minority(paths, labels, seed)
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    ds = ds.map(decode_image, num_parallel_calls=AUTOTUNE, deterministic=not training)
+
+    if cache_dir:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        ds = ds.cache(str(Path(cache_dir) / f"{Path(data_dir).name}_{cache_key(data_dir, paths)}"))
+    else:
+        ds = ds.cache()
+
+    if training:
+        ds = ds.shuffle(min(shuffle_buffer, len(paths)), seed=seed, reshuffle_each_iteration=True)
+
+    ds = ds.batch(batch_size)
+    ds = ds.map(normalize_image, num_parallel_calls=AUTOTUNE)
+    return ds.prefetch(AUTOTUNE), len(paths)
+
+def set_precision(mode):
+    """
+    Sets the global Keras dtype policy. "bfloat16" helps on CPUs with native
+    bf16 support (AVX512-BF16 / AMX); "float16" is mainly useful on GPUs.
+    """
+    policy = {"off": "float32", "bfloat16": "mixed_bfloat16", "float16": "mixed_float16"}[mode]
+    tf.keras.mixed_precision.set_global_policy(policy)
+    logger.info(f"Keras dtype policy set to: {policy}")
+
+class ThroughputLogger(tf.keras.callbacks.Callback):
+    """
+    Logs training throughput in images per second at the end of each epoch.
+    Only time spent in training batches is counted, so validation is excluded.
+    """
+    def __init__(self, num_images):
+        super(ThroughputLogger, self).__init__()
+        self.num_images = num_images
+        self.batch_start = None
+        self.train_time = 0.0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.train_time = 0.0
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self.batch_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.train_time += time.perf_counter() - self.batch_start
+
+    def on_epoch_end(self, epoch, logs=None):
+        rate = self.num_images / self.train_time if self.train_time > 0 else 0.0
+        logger.info(f"Epoch {epoch + 1}: {rate:.1f} images/sec ({self.train_time:.1f}s training)")
+
+def train_model(train_ds, num_train, val_ds=None, epochs=30, learning_rate=1e-4, class_weight=None):
+    """
+    Trains a fresh FibonacciNet with the notebook's optimizer, loss and callbacks.
+    Class balancing is done by the caller, via an oversampled dataset or class_weight.
+    """
+    model = create_fibonacci_net(input_shape=MODEL_INPUT_SHAPE)
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss="binary_crossentropy",
+        metrics=["accuracy", tf.keras.metrics.AUC(name="auc")]
+    )
+
+    monitor = "val_loss" if val_ds is not None else "loss"
+    callbacks = [
+        ThroughputLogger(num_train),
+        tf.keras.callbacks.EarlyStopping(monitor=monitor, patience=3, restore_best_weights=True),
+        tf.keras.callbacks.ReduceLROnPlateau(monitor=monitor, factor=0.5, patience=2, verbose=1)
+    ]
+    model.fit(train_ds, validation_data=val_ds, epochs=epochs, callbacks=callbacks, class_weight=class_weight)
+    return model
+
+def evaluate_model(model, eval_ds, threshold=0.5):
+    """
+    Streams AUROC and confusion-matrix metrics over a dataset batch by batch,
+    so the held-out set never has to fit in memory at once.
+    """
+    auc = tf.keras.metrics.AUC(name="auroc")
+    tp = tf.keras.metrics.TruePositives(thresholds=threshold)
+    fp = tf.keras.metrics.FalsePositives(thresholds=threshold)
+    tn = tf.keras.metrics.TrueNegatives(thresholds=threshold)
+    fn = tf.keras.metrics.FalseNegatives(thresholds=threshold)
+
+    num_images = 0
+    start = time.perf_counter()
+    for images, labels in eval_ds:
+        preds = tf.cast(model(images, training=False), tf.float32)
+        for metric in (auc, tp, fp, tn, fn):
+            metric.update_state(labels, preds)
+        num_images += int(images.shape[0])
+    elapsed = time.perf_counter() - start
+
+    tp, fp, tn, fn = (float(m.result()) for m in (tp, fp, tn, fn))
+    results = {
+        "auroc": float(auc.result()),
+        "accuracy": (tp + tn) / max(num_images, 1),
+        "sensitivity": tp / max(tp + fn, 1),
+        "specificity": tn / max(tn + fp, 1),
+        "confusion_matrix": np.array([[tn, fp], [fn, tp]], dtype=int).tolist(),
+        "images": num_images,
+        "images_per_sec": num_images / elapsed if elapsed > 0 else 0.0
+    }
+    logger.info(f"Evaluation on {num_images} images at {results['images_per_sec']:.1f} images/sec")
+    return results
+
+def export_model(model, output_path):
+    """
+    Saves a float32 `.keras` artifact loadable by backend.routes.load_model().
+    Models trained under a mixed policy are rebuilt in float32 first so the
+    serving path is not tied to the training precision.
+    """
+    if model.dtype_policy.name != "float32":
+        tf.keras.mixed_precision.set_global_policy("float32")
+        export = create_fibonacci_net(input_shape=MODEL_INPUT_SHAPE)
+        export.set_weights(model.get_weights())
+        model = export
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    model.save(output_path)
+    logger.info(f"Model saved to {output_path}")
+    return output_path